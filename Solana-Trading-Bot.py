@@ -8,26 +8,19 @@ import logging
 import base64
 import json
 import time
-from decimal import Decimal
-import requests
-import nest_asyncio
-nest_asyncio.apply()  
-from solana.rpc.async_api import AsyncClient
-from solders.keypair import Keypair
-from solders.pubkey import Pubkey
+import functools
+import importlib.util
+from datetime import datetime, timedelta, timezone
+import httpx
+import orjson
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential_jitter
 
 from telegram import Update
 from telegram.ext import ApplicationBuilder, CommandHandler, ContextTypes
 from dotenv import load_dotenv
 load_dotenv()
-# Optional: jupiter-python-sdk wrapper (recommended if installed)
-try:
-    from jupiter_python_sdk.jupiter import Jupiter
-    HAVE_JUPITER_SDK = True
-except Exception:
-    HAVE_JUPITER_SDK = False
-
-logging.basicConfig(level=logging.INFO)
+
+logging.basicConfig(level=logging.INFO, force=True, format="%(asctime)s %(levelname)s %(name)s %(message)s")
 logger = logging.getLogger("sol-bot")
 
 # CONFIG (edit or set via environment variables)
@@ -36,6 +29,12 @@ RPC_URL = os.getenv("RPC_URL", "https://api.mainnet-beta.solana.com")
 PRIVATE_KEY_JSON = os.getenv("PRIVATE_KEY_JSON")     # path to keypair json (array of ints)
 PRIVATE_KEY_B58 = os.getenv("PRIVATE_KEY_B58")       # alt: base58-encoded private key bytes
 DRY_RUN = os.getenv("DRY_RUN", "true").lower() == "true"
+AUTO_BUY_USDC = 5.0                                  # USDC spent per automatic buy (adjust)
+PRICE_TTL_SECONDS = int(os.getenv("PRICE_TTL_SECONDS", "30"))  # reuse CoinGecko price for this long
+HTTP_CONCURRENCY = int(os.getenv("HTTP_CONCURRENCY", "10"))     # max in-flight upstream requests
+MONITOR_INTERVAL_SECONDS = 60                        # price / TP check cadence (adjust)
+MONITOR_MAX_BACKOFF_SECONDS = 900                    # cap on the delay after repeated monitor failures
+STATE_FILE = os.getenv("STATE_FILE", "bot_state.json")  # STATE survives restarts here
 
 # Default strategy params (you can change via Telegram)
 STATE = {
@@ -46,16 +45,100 @@ STATE = {
     "position_amount_sol": 0.0
 }
 
+# Position fields are only restored in the mode (DRY_RUN or live) that wrote them
+_POSITION_KEYS = ("holding", "last_buy_price", "position_amount_sol")
+
+# Persist STATE atomically (write + fsync temp file, then rename) so a crash never leaves it half-written
+def _write_state(data):
+    tmp = STATE_FILE + ".tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, STATE_FILE)
+    except OSError as e:
+        logger.error("State not persisted to %s: %s", STATE_FILE, e)
+
+_state_write_lock = None
+
+async def _save_state():
+    # snapshot on the loop, do the disk I/O in a worker thread; the lock keeps writes in order
+    global _state_write_lock
+    if _state_write_lock is None:
+        _state_write_lock = asyncio.Lock()
+    data = orjson.dumps({**STATE, "dry_run": DRY_RUN})
+    async with _state_write_lock:
+        await asyncio.to_thread(_write_state, data)
+
+def _state_value(key, v):
+    # reject values that would break the strategy math instead of trusting the file
+    if key == "holding":
+        if isinstance(v, bool):
+            return v
+    elif key == "last_buy_price" and v is None:
+        return None
+    elif isinstance(v, (int, float)) and not isinstance(v, bool):
+        return float(v)
+    raise ValueError(f"invalid {key}: {v!r}")
+
+def _load_state():
+    if not os.path.exists(STATE_FILE):
+        return
+    try:
+        with open(STATE_FILE, "rb") as f:
+            saved = orjson.loads(f.read())
+        if not isinstance(saved, dict):
+            raise ValueError("expected a JSON object")
+    except (OSError, ValueError) as e:  # orjson.JSONDecodeError is a ValueError
+        logger.warning("Ignoring unreadable state file %s, using defaults: %s", STATE_FILE, e)
+        return
+    if saved.pop("dry_run", None) != DRY_RUN:
+        # never let a simulated position leak into live trading (or vice versa)
+        logger.warning("State file %s was written with a different DRY_RUN; not restoring the position", STATE_FILE)
+        for k in _POSITION_KEYS:
+            saved.pop(k, None)
+    # only known keys, with the types STATE expects; anything else keeps its default
+    for k in STATE:
+        if k not in saved:
+            continue
+        try:
+            STATE[k] = _state_value(k, saved[k])
+        except ValueError as e:
+            logger.warning("State file %s: %s; keeping default", STATE_FILE, e)
+
 # Token mints (mainnet)
 WSOL_MINT = "So11111111111111111111111111111111111111112"
 USDC_MINT = "EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v"
 
 COINGECKO_MARKETS = "https://api.coingecko.com/api/v3/coins/markets"
-JUP_QUOTE_API = "https://quote-api.jup.ag/v6/quote"
-JUP_SWAP_API = "https://quote-api.jup.ag/v6/swap"
+_CG_PARAMS = {
+    "vs_currency": "usd",
+    "ids": "solana",
+    "order": "market_cap_desc",
+    "per_page": "1",
+    "page": "1",
+    "sparkline": "false",
+    "price_change_percentage": "24h"
+}
+_CG_URL = httpx.URL(COINGECKO_MARKETS, params=_CG_PARAMS)  # query encoded once at import
+JUP_BASE = os.getenv("JUPITER_BASE_URL", "https://public.jupiterapi.com").rstrip("/")
+JUP_QUOTE_API = f"{JUP_BASE}/quote"
+JUP_SWAP_API = f"{JUP_BASE}/swap"
+
+# Optional: jupiter-python-sdk wrapper (recommended if installed), imported on first trade
+@functools.lru_cache(maxsize=1)
+def _get_jupiter_sdk():
+    try:
+        from jupiter_python_sdk.jupiter import Jupiter
+        return Jupiter
+    except Exception:
+        return None
 
-# Helper: load keypair
+# Helper: load keypair (derived once per process)
+@functools.lru_cache(maxsize=1)
 def load_keypair():
+    from solders.keypair import Keypair
     if PRIVATE_KEY_B58:
         import base58
         raw = base58.b58decode(PRIVATE_KEY_B58)
@@ -66,63 +149,140 @@ def load_keypair():
         return Keypair.from_bytes(secret)
     raise RuntimeError("No PRIVATE_KEY configured. Set PRIVATE_KEY_JSON or PRIVATE_KEY_B58")
 
-# Price / 24h change (CoinGecko)
-def fetch_sol_24h_change_and_price():
-    params = {
-        "vs_currency": "usd",
-        "ids": "solana",
-        "order": "market_cap_desc",
-        "per_page": 1,
-        "page": 1,
-        "sparkline": "false",
-        "price_change_percentage": "24h"
-    }
-    r = requests.get(COINGECKO_MARKETS, params=params, timeout=10)
+# Helper: wallet public key as base58 string (derived once per process)
+@functools.lru_cache(maxsize=1)
+def wallet_pubkey_str():
+    return str(load_keypair().pubkey())
+
+# Helper: Solana RPC client, created on the first live trade that needs it (only the SDK path does)
+def get_rpc(bot_data):
+    if "rpc" not in bot_data:
+        from solana.rpc.async_api import AsyncClient
+        from solana.rpc.commitment import Confirmed
+        bot_data["rpc"] = AsyncClient(RPC_URL, commitment=Confirmed, timeout=30)
+    return bot_data["rpc"]
+
+# Helpers: one long-lived HTTP client per upstream (keep-alive / TLS reuse across calls)
+def jupiter_http_client():
+    # HTTP/2 multiplexes the parallel quote/swap calls over one connection (needs httpx[http2])
+    http2 = importlib.util.find_spec("h2") is not None
+    if not http2:
+        logger.warning("h2 not installed; Jupiter client falls back to HTTP/1.1 (pip install 'httpx[http2]')")
+    limits = httpx.Limits(max_keepalive_connections=20, max_connections=50, keepalive_expiry=300.0)
+    return httpx.AsyncClient(http2=http2, limits=limits, timeout=10)
+
+def coingecko_http_client():
+    return httpx.AsyncClient(headers={"accept-encoding": "gzip"}, timeout=10)
+
+# Rate-limit defense: cap in-flight requests, back off on 429 / 5xx
+_rate_limit_sem = None
+
+def rate_limit_sem():
+    # created on first use so it binds to the running loop, like price_lock()
+    global _rate_limit_sem
+    if _rate_limit_sem is None:
+        _rate_limit_sem = asyncio.Semaphore(HTTP_CONCURRENCY)
+    return _rate_limit_sem
+
+def _is_retryable(e):
+    if not isinstance(e, httpx.HTTPStatusError):
+        return False
+    status = e.response.status_code
+    return status == 429 or status >= 500
+
+http_retry = retry(
+    wait=wait_exponential_jitter(initial=0.5, max=30),
+    retry=retry_if_exception(_is_retryable),
+    stop=stop_after_attempt(5),
+    reraise=True,
+)
+
+# Price / 24h change (CoinGecko), cached for PRICE_TTL_SECONDS
+_price_cache = {"t": 0.0, "v": None}
+_price_lock = None
+
+def price_lock():
+    # created on first use so it binds to the running loop (an import-time Lock breaks on Python 3.9)
+    global _price_lock
+    if _price_lock is None:
+        _price_lock = asyncio.Lock()
+    return _price_lock
+
+# fresh=True skips the cached value (e.g. right after a trade) and refreshes it
+async def fetch_sol_24h_change_and_price(client, fresh=False):
+    if not fresh and _price_cache["v"] is not None and time.monotonic() - _price_cache["t"] < PRICE_TTL_SECONDS:
+        return _price_cache["v"]
+    # concurrent callers wait here and reuse the single refresh
+    async with price_lock():
+        if not fresh and _price_cache["v"] is not None and time.monotonic() - _price_cache["t"] < PRICE_TTL_SECONDS:
+            return _price_cache["v"]
+        v = await _fetch_sol_24h_change_and_price(client)
+        _price_cache["t"] = time.monotonic()
+        _price_cache["v"] = v
+        return v
+
+@http_retry
+async def _fetch_sol_24h_change_and_price(client):
+    async with rate_limit_sem():
+        r = await client.get(_CG_URL)
     r.raise_for_status()
-    data = r.json()
+    data = orjson.loads(r.content)
     if not data:
         raise RuntimeError("CoinGecko returned empty")
     d = data[0]
     # field names: current_price, price_change_percentage_24h (CoinGecko)
-    price = Decimal(str(d.get("current_price")))
-    pct24 = Decimal(str(d.get("price_change_percentage_24h") or 0.0))
-    return float(price), float(pct24)
+    price = float(d.get("current_price"))
+    pct24 = float(d.get("price_change_percentage_24h") or 0.0)
+    return price, pct24
 
 # Build a Jupiter quote (example: buy SOL with USDC)
-def get_jupiter_quote(amount_in_native_int):
+@http_retry
+async def get_jupiter_quote(client, amount_in_native_int):
     params = {
         "inputMint": USDC_MINT,
         "outputMint": WSOL_MINT,
         "amount": str(amount_in_native_int),   # amount in smallest units (USDC has 6 decimals)
         "slippageBps": "100"                   # 100 = 1% slippage BPS
     }
-    r = requests.get(JUP_QUOTE_API, params=params, timeout=10)
+    async with rate_limit_sem():
+        r = await client.get(JUP_QUOTE_API, params=params)
     r.raise_for_status()
-    return r.json()
+    return orjson.loads(r.content)
+
+_JSON_HEADERS = {"content-type": "application/json"}
 
 # Build and request the swap from Jupiter (returns base64 unsigned transaction)
-def request_jupiter_swap(quote_response, user_pubkey_str):
+@http_retry
+async def request_jupiter_swap(client, quote_response, user_pubkey_str):
     body = {"quoteResponse": quote_response, "userPublicKey": user_pubkey_str}
-    r = requests.post(JUP_SWAP_API, json=body, timeout=15)
+    async with rate_limit_sem():
+        r = await client.post(JUP_SWAP_API, content=orjson.dumps(body), headers=_JSON_HEADERS, timeout=15)
     r.raise_for_status()
-    return r.json()
+    return orjson.loads(r.content)
+
+# Convert USDC amount to smallest units (USDC usually 6 decimals)
+def usdc_to_native(usdc_amount):
+    return int(round(float(usdc_amount) * 1_000_000))
 
 # HIGH LEVEL: Buy function (example uses Jupiter swap API — advanced)
-async def buy_with_usdc(async_client, keypair, usdc_amount):
+# `user_pubkey_str` must be str(keypair.pubkey()) (see wallet_pubkey_str()).
+# Pass a prefetched `quote` for usdc_amount to skip the quote round-trip.
+async def buy_with_usdc(bot_data, keypair, user_pubkey_str, usdc_amount, quote=None):
     logger.info("BUY requested: USDC amount = %s (this is the amount token units, e.g., 1 USDC => 1)", usdc_amount)
     if DRY_RUN:
         logger.info("DRY_RUN is enabled — not executing on-chain. Simulating buy.")
         return {"simulated": True, "usdc": usdc_amount}
 
-    # Convert USDC amount to smallest units (USDC usually 6 decimals)
-    amount_int = int(Decimal(usdc_amount) * (10 ** 6))
-    quote = get_jupiter_quote(amount_int)
+    jup_http = bot_data["jup_http"]
+    if quote is None:
+        quote = await get_jupiter_quote(jup_http, usdc_to_native(usdc_amount))
     if not quote.get("data"):
         raise RuntimeError("No quote data returned from Jupiter")
     # Option A: if you installed jupiter sdk you can use it (recommended)
-    if HAVE_JUPITER_SDK:
+    Jupiter = _get_jupiter_sdk()
+    if Jupiter is not None:
         logger.info("Using jupiter-python-sdk to execute swap (SDK handles signing + sending).")
-        jup = Jupiter(async_client, keypair)
+        jup = Jupiter(get_rpc(bot_data), keypair)
         # NOTE: the exact method names in the SDK might differ; check the SDK README.
         # The SDK will generally have methods to get a quote and execute the swap in one call.
         # Example pseudocode (SDK may use different names):
@@ -134,12 +294,16 @@ async def buy_with_usdc(async_client, keypair, usdc_amount):
             raise
 
     # Option B: manual request via REST swap API (advanced)
-    swap_resp = request_jupiter_swap(quote, str(keypair.pubkey()))
+    # /swap needs the quote and stamps its own recent blockhash into the tx, so there is no
+    # independent call to overlap here. monitor_tick prefetches the quote for automatic buys;
+    # /manualbuy quotes inline above.
+    swap_resp = await request_jupiter_swap(jup_http, quote, user_pubkey_str)
     # swap_resp usually includes 'swapTransaction' base64 (unsigned or partially-signed)
     tx_b64 = swap_resp.get("swapTransaction") or swap_resp.get("swapTransactionSerialized")
     if not tx_b64:
         raise RuntimeError("Jupiter /swap did not return a transaction payload")
-    tx_bytes = base64.b64decode(tx_b64)
+    # decode/parse in a worker thread so a large tx doesn't stall other handlers
+    tx_bytes = await asyncio.to_thread(base64.b64decode, tx_b64)
 
     # Use solders to create VersionedTransaction, sign, serialize, and send
     # This area is advanced: versioned tx deserializing & signing differs across library versions.
@@ -149,7 +313,7 @@ async def buy_with_usdc(async_client, keypair, usdc_amount):
     from solana.rpc.types import TxOpts
 
     # Deserialize:
-    vtx = VersionedTransaction.from_bytes(tx_bytes)
+    vtx = await asyncio.to_thread(VersionedTransaction.from_bytes, tx_bytes)
     # NOTE: VersionedTransaction doesn't have .sign() — you need to use the SDK or proper sign helper.
     # If you use solders directly you must add signatures yourself (advanced).
     # Instead, prefer jupiter-python-sdk or use solana-py helpers for signing versioned txns.
@@ -165,18 +329,22 @@ async def start_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def setbuy_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         v = float(context.args[0])
-        STATE["buy_drop_pct"] = v
-        await update.message.reply_text(f"Buy drop set to {v}%")
     except Exception:
         await update.message.reply_text("Usage: /setbuy 5.0  (for 5%)")
+        return
+    STATE["buy_drop_pct"] = v
+    await _save_state()
+    await update.message.reply_text(f"Buy drop set to {v}%")
 
 async def settp_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         v = float(context.args[0])
-        STATE["take_profit_pct"] = v
-        await update.message.reply_text(f"TP set to {v}%")
     except Exception:
         await update.message.reply_text("Usage: /settp 2.0  (for 2%)")
+        return
+    STATE["take_profit_pct"] = v
+    await _save_state()
+    await update.message.reply_text(f"TP set to {v}%")
 
 async def status_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     s = json.dumps(STATE, indent=2)
@@ -189,39 +357,77 @@ async def manualbuy_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     usdc_amount = float(context.args[0])
     await update.message.reply_text(f"Scheduled manual buy of {usdc_amount} USDC (dry_run={DRY_RUN}). Running it now...")
-    # run an async buy
-    keypair = load_keypair()
-    async_client = AsyncClient(RPC_URL)
-    try:
-        res = await buy_with_usdc(async_client, keypair, usdc_amount)
-        await update.message.reply_text(f"Buy result: {res}")
-    except Exception as e:
-        await update.message.reply_text(f"Buy failed: {e}")
+    bot_data = context.bot_data
+    # hold the monitor lock so a concurrent tick can't auto-buy on top of this one
+    async with bot_data["monitor_lock"]:
+        try:
+            keypair = load_keypair()
+            res = await buy_with_usdc(bot_data, keypair, wallet_pubkey_str(), usdc_amount)
+        except Exception as e:
+            await update.message.reply_text(f"Buy failed: {e}")
+            return
+        # record the position like monitor_tick does, priced fresh rather than from the cache
+        try:
+            price, _ = await fetch_sol_24h_change_and_price(bot_data["cg_http"], fresh=True)
+        except Exception as e:
+            logger.warning("Could not price manual buy, next monitor tick will: %s", e)
+            price = None
+        STATE["holding"] = True
+        STATE["last_buy_price"] = price
+        STATE["position_amount_sol"] = 0.0  # set real amount from swap result
+        await _save_state()
+    await update.message.reply_text(f"Buy result: {res}")
+    # re-check TP right away on a fresh price instead of waiting for the next tick
+    context.job_queue.run_once(monitor_tick, 0, data={"fresh_price": True})
 
 async def manualsell_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text("Manual sell requested. (Implement symmetric to buy_with_usdc)")
 
-# Monitoring background task
-async def monitor_task(app):
-    keypair = load_keypair()
-    async_client = AsyncClient(RPC_URL)
-    while True:
+# Monitoring: one check per JobQueue tick (every MONITOR_INTERVAL_SECONDS, plus a fresh re-check after /manualbuy)
+async def monitor_tick(context: ContextTypes.DEFAULT_TYPE):
+    bot_data = context.application.bot_data
+    jup_http, cg_http = bot_data["jup_http"], bot_data["cg_http"]
+    # one-off re-check after /manualbuy (vs. the repeating job): fresh price, no backoff bookkeeping
+    recheck = bool(context.job.data and context.job.data.get("fresh_price"))
+    # ticks (and /manualbuy) must never overlap, or both could buy
+    async with bot_data["monitor_lock"]:
         try:
-            price, pct24 = fetch_sol_24h_change_and_price()
-            logger.info(f"SOL price ${price:.4f}, 24h change {pct24:.2f}%")
+            quote = None
+            if not STATE["holding"] and not DRY_RUN:
+                # prefetch the buy quote alongside the price so a triggered buy skips that round-trip
+                price_res, quote = await asyncio.gather(
+                    fetch_sol_24h_change_and_price(cg_http, fresh=recheck),
+                    get_jupiter_quote(jup_http, usdc_to_native(AUTO_BUY_USDC)),
+                    return_exceptions=True,
+                )
+                if isinstance(price_res, BaseException):
+                    raise price_res
+                if isinstance(quote, BaseException):
+                    logger.warning("Quote prefetch failed, will re-quote on buy: %s", quote)
+                    quote = None
+                price, pct24 = price_res
+            else:
+                price, pct24 = await fetch_sol_24h_change_and_price(cg_http, fresh=recheck)
+            logger.info("SOL price $%.4f, 24h change %.2f%%", price, pct24)
             # If not holding and drop exceeds threshold -> buy
             if (not STATE["holding"]) and (pct24 <= -abs(STATE["buy_drop_pct"])):
                 logger.info("Condition met to BUY.")
-                # Example: buy with 5 USDC (adjust)
                 try:
-                    res = await buy_with_usdc(async_client, keypair, usdc_amount=5.0)
+                    keypair = load_keypair()
+                    res = await buy_with_usdc(bot_data, keypair, wallet_pubkey_str(), usdc_amount=AUTO_BUY_USDC, quote=quote)
                     logger.info("Buy response: %s", res)
+                except Exception as e:
+                    logger.exception("Buy failed: %s", e)
+                else:
                     # If buy succeeded, set state (this is simplified)
                     STATE["holding"] = True
                     STATE["last_buy_price"] = price
                     STATE["position_amount_sol"] = 0.0  # set real amount from swap result
-                except Exception as e:
-                    logger.exception("Buy failed: %s", e)
+                    await _save_state()
+            # A manual buy that couldn't be priced takes its buy price from this tick
+            if STATE["holding"] and STATE["last_buy_price"] is None:
+                STATE["last_buy_price"] = price
+                await _save_state()
             # If holding, check TP
             if STATE["holding"] and STATE["last_buy_price"]:
                 target = STATE["last_buy_price"] * (1.0 + STATE["take_profit_pct"] / 100.0)
@@ -232,16 +438,49 @@ async def monitor_task(app):
                     STATE["holding"] = False
                     STATE["last_buy_price"] = None
                     STATE["position_amount_sol"] = 0.0
+                    await _save_state()
+            if not recheck:
+                bot_data["monitor_fails"] = 0
         except Exception as e:
-            logger.exception("Monitor loop error: %s", e)
-        await asyncio.sleep(60)  # poll every 60s (adjust)
+            if recheck:
+                logger.exception("Monitor re-check error: %s", e)
+                return
+            # back off exponentially while upstreams fail; the interval cadence resumes after the delayed run
+            delay = min(MONITOR_INTERVAL_SECONDS * 2 ** bot_data["monitor_fails"], MONITOR_MAX_BACKOFF_SECONDS)
+            bot_data["monitor_fails"] += 1
+            logger.exception("Monitor loop error (next check in %ss): %s", delay, e)
+            next_run = datetime.now(timezone.utc) + timedelta(seconds=delay)
+            context.job.job.modify(next_run_time=next_run)
+
+# Close shared clients when the application shuts down
+async def on_shutdown(app):
+    if "rpc" in app.bot_data:
+        await app.bot_data["rpc"].close()
+    await app.bot_data["jup_http"].aclose()
+    await app.bot_data["cg_http"].aclose()
 
 # Main startup
 async def main():
     if not TELEGRAM_TOKEN:
         raise RuntimeError("Set TELEGRAM_TOKEN env var")
+    _load_state()
 
-    app = ApplicationBuilder().token(TELEGRAM_TOKEN).build()
+    # concurrent_updates: a slow /manualbuy must not hold up /status for other users
+    app = (
+        ApplicationBuilder()
+        .token(TELEGRAM_TOKEN)
+        .concurrent_updates(True)
+        .connection_pool_size(20)
+        .connect_timeout(10)
+        .read_timeout(30)
+        .build()
+    )
+    if app.job_queue is None:
+        raise RuntimeError("JobQueue unavailable. Install python-telegram-bot[job-queue]")
+    app.bot_data["jup_http"] = jupiter_http_client()
+    app.bot_data["cg_http"] = coingecko_http_client()
+    app.bot_data["monitor_lock"] = asyncio.Lock()
+    app.bot_data["monitor_fails"] = 0
     app.add_handler(CommandHandler("start", start_cmd))
     app.add_handler(CommandHandler("setbuy", setbuy_cmd))
     app.add_handler(CommandHandler("settp", settp_cmd))
@@ -249,10 +488,22 @@ async def main():
     app.add_handler(CommandHandler("manualbuy", manualbuy_cmd))
     app.add_handler(CommandHandler("manualsell", manualsell_cmd))
 
-    # start monitor background task
-    # app.create_task(monitor_task(app))
-    asyncio.create_task(monitor_task(app))
-    await app.run_polling()
+    # first check at startup, then poll every MONITOR_INTERVAL_SECONDS
+    app.job_queue.run_repeating(monitor_tick, interval=MONITOR_INTERVAL_SECONDS, first=0)
+
+    # run polling on this loop (run_polling() would start its own)
+    async with app:
+        await app.start()
+        await app.updater.start_polling()
+        try:
+            await asyncio.Event().wait()  # run until cancelled (Ctrl+C)
+        finally:
+            await app.updater.stop()
+            await app.stop()
+            await on_shutdown(app)
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass